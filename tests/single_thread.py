@@ -5,6 +5,7 @@ Measures pure throughput without concurrency overhead
 """
 
 import socket
+import threading
 import time
 import argparse
 import sys
@@ -16,50 +17,70 @@ class KVStoreClient:
         self.port = port
         self.reuse_connection = reuse_connection
         self.sock = None
+        # Reusable receive buffer: responses are read straight into it with
+        # recv_into, so no per-connection reader or per-chunk bytes is allocated
+        self._rbuf = bytearray(8192)
+        self._rview = memoryview(self._rbuf)
     
     def _get_socket(self):
         """Get a socket connection, reusing if enabled"""
         if self.reuse_connection and self.sock:
-            try:
-                # Test if socket is still alive
-                self.sock.sendall(b'\n')
-                return self.sock
-            except:
-                self.sock = None
+            return self.sock
         
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.settimeout(10.0)
         sock.connect((self.host, self.port))
+        # Commands are tiny request/response pairs; don't let Nagle hold them back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
         
-        if self.reuse_connection:
-            self.sock = sock
-        
+        self.sock = sock
         return sock
     
-    def _send_command(self, command):
-        """Send a command and get response"""
+    def _read_response(self, sock):
+        """Read one newline-terminated response into the receive buffer
+        
+        The server answers each command with exactly one line, so nothing
+        past the newline needs to be kept for the next call.
+        """
+        total = 0
+        while True:
+            if total == len(self._rbuf):
+                # Response larger than the buffer: grow it, keeping what was read
+                self._rview.release()
+                self._rbuf = self._rbuf + bytearray(len(self._rbuf))
+                self._rview = memoryview(self._rbuf)
+            
+            n = sock.recv_into(self._rview[total:])
+            if not n:
+                raise ConnectionError("Connection closed by server")
+            newline = self._rbuf.find(b'\n', total, total + n)
+            total += n
+            if newline >= 0:
+                return str(self._rview[:newline], 'utf-8').strip()
+    
+    def _send_command(self, payload):
+        """Send a newline-terminated command and get response"""
         sock = self._get_socket()
         try:
-            sock.sendall((command + '\n').encode())
-            
-            response = b''
-            while True:
-                chunk = sock.recv(1024)
-                if not chunk:
-                    break
-                response += chunk
-                if b'\n' in response:
-                    break
+            try:
+                sock.sendall(payload)
+                response = self._read_response(sock)
+            except ConnectionError:
+                if not self.reuse_connection:
+                    raise
+                # The persistent connection went stale: reconnect and retry once
+                self.close()
+                sock = self._get_socket()
+                sock.sendall(payload)
+                response = self._read_response(sock)
             
             if not self.reuse_connection:
-                sock.close()
+                self.close()
             
-            return response.decode().strip()
+            return response
         except Exception as e:
-            if not self.reuse_connection and sock:
-                sock.close()
-            if self.reuse_connection:
-                self.sock = None
+            self.close()
             return f"ERROR: {str(e)}"
     
     def close(self):
@@ -68,14 +89,39 @@ class KVStoreClient:
             self.sock.close()
             self.sock = None
     
+    # Keys and values are bytes; each command is assembled with a single join,
+    # which allocates only the final bytes object (chained + copies every partial)
     def set(self, key, value):
-        return self._send_command(f"SET {key} {value}")
+        return self._send_command(b"".join((b"SET ", key, b" ", value, b"\n")))
     
     def get(self, key):
-        return self._send_command(f"GET {key}")
+        return self._send_command(b"".join((b"GET ", key, b"\n")))
     
     def delete(self, key):
-        return self._send_command(f"DEL {key}")
+        return self._send_command(b"".join((b"DEL ", key, b"\n")))
+
+
+class ProgressDots:
+    """Print a dot every interval from a background thread while a timed region runs
+    
+    Keeps progress output (a flushed write syscall) out of the measured loop.
+    """
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(".", end='', flush=True)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
 
 
 def run_throughput_test(client, num_ops, workload='mixed'):
@@ -83,59 +129,62 @@ def run_throughput_test(client, num_ops, workload='mixed'):
     successes = 0
     errors = 0
     
+    # Encode every key and value up front so the timed loop only indexes lists
+    keys = [f"test_key_{i}".encode() for i in range(num_ops)]
+    values = [f"test_value_{i}".encode() for i in range(num_ops)]
+    
     # Warmup phase
     print("Warming up...", end='', flush=True)
     for i in range(min(100, num_ops // 10)):
+        warmup_key = f"warmup_key_{i}".encode()
         if workload == 'set':
-            client.set(f"warmup_key_{i}", "warmup_value")
+            client.set(warmup_key, b"warmup_value")
         elif workload == 'get':
-            client.get(f"warmup_key_{i}")
+            client.get(warmup_key)
         elif workload == 'mixed':
             if i % 2 == 0:
-                client.set(f"warmup_key_{i}", "warmup_value")
+                client.set(warmup_key, b"warmup_value")
             else:
-                client.get(f"warmup_key_{i}")
+                client.get(warmup_key)
     print(" done")
     
     # Pre-populate keys for GET-only tests
     if workload == 'get':
         print("Pre-populating keys...", end='', flush=True)
         for i in range(num_ops):
-            client.set(f"test_key_{i}", f"test_value_{i}")
+            client.set(keys[i], values[i])
         print(" done")
     
     # Actual test
     print(f"Running {num_ops:,} operations...", end='', flush=True)
-    start_time = time.perf_counter()
-    
-    for i in range(num_ops):
-        if workload == 'set':
-            result = client.set(f"test_key_{i}", f"test_value_{i}")
-            success = result == "OK"
-        elif workload == 'get':
-            result = client.get(f"test_key_{i % num_ops}")
-            success = result != "ERROR" and result != "NOT_FOUND"
-        elif workload == 'mixed':
-            if i % 2 == 0:
-                result = client.set(f"test_key_{i}", f"test_value_{i}")
+    with ProgressDots():
+        start_time = time.perf_counter()
+        
+        for i in range(num_ops):
+            if workload == 'set':
+                result = client.set(keys[i], values[i])
+                success = result == "OK"
+            elif workload == 'get':
+                result = client.get(keys[i % num_ops])
+                success = result != "ERROR" and result != "NOT_FOUND"
+            elif workload == 'mixed':
+                if i % 2 == 0:
+                    result = client.set(keys[i], values[i])
+                    success = result == "OK"
+                else:
+                    result = client.get(keys[i - 1])
+                    success = result != "ERROR"
+            else:  # write-only for other workloads
+                result = client.set(keys[i], values[i])
                 success = result == "OK"
+            
+            if success:
+                successes += 1
             else:
-                result = client.get(f"test_key_{i-1}")
-                success = result != "ERROR"
-        else:  # write-only for other workloads
-            result = client.set(f"test_key_{i}", f"test_value_{i}")
-            success = result == "OK"
-        
-        if success:
-            successes += 1
-        else:
-            errors += 1
+                errors += 1
         
-        # Progress indicator
-        if (i + 1) % (num_ops // 10) == 0:
-            print(".", end='', flush=True)
+        end_time = time.perf_counter()
     
-    end_time = time.perf_counter()
     elapsed = end_time - start_time
     print(" done")
     
@@ -180,7 +229,7 @@ Examples:
     # Check if server is running
     try:
         test_client = KVStoreClient(args.host, args.port)
-        result = test_client.set("connection_test", "test")
+        result = test_client.set(b"connection_test", b"test")
         if "ERROR" in result and "Connection" in result:
             print(f"Error: Cannot connect to server at {args.host}:{args.port}")
             sys.exit(1)
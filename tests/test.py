@@ -4,225 +4,611 @@ Comprehensive concurrent performance test for KVStore
 Tests various workloads: read-heavy, write-heavy, balanced, and mixed operations
 """
 
+import asyncio
 import socket
 import threading
 import time
-import statistics
-from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
+import functools
+import multiprocessing
+import os
+import queue
 import sys
 
+import numpy as np
+
+# Kernel receive buffer for client sockets, roomy enough for a whole pipelined
+# batch of responses to land without backpressure
+SOCKET_RCVBUF = 256 * 1024
+
+
+def tune_socket(sock):
+    """Set client socket options; must run before connect for SO_RCVBUF to size the TCP window"""
+    # Commands are tiny; never let Nagle hold one back waiting to coalesce
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
+
+
+def fail_batch(commands, responses, stamps, error):
+    """Answer every command of a broken batch that got no response with the error"""
+    missing = len(commands) - len(responses)
+    responses.extend([f"ERROR: {str(error)}"] * missing)
+    stamps.extend([time.perf_counter_ns()] * missing)
+
+
+def finish_batch(start, responses, stamps):
+    """Turn a batch's raw completion timestamps into latencies with one vectorized subtract
+    
+    The read loop only appends perf_counter_ns() stamps, leaving the per-op
+    arithmetic to numpy.
+    """
+    return responses, np.array(stamps, dtype=np.int64) - start
+
+
 class KVStoreClient:
+    """Client shared by all worker threads, with one persistent connection per thread
+    
+    Each thread connects lazily on its first command and reuses that connection
+    for every later one. A failed connection is dropped and reopened on the
+    thread's next command.
+    """
     def __init__(self, host='localhost', port=8080):
         self.host = host
         self.port = port
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
     
-    def _send_command(self, command):
-        """Send a command and get response"""
-        try:
+    def _connection(self):
+        """Get this thread's (socket, buffered reader), connecting if needed
+        
+        Writes go straight to the socket with sendall; only reads are buffered,
+        so readline() pulls many responses per recv and splits lines in C.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or conn[1].closed:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(5.0)
+            tune_socket(sock)
             sock.connect((self.host, self.port))
-            sock.sendall((command + '\n').encode())
-            
-            response = b''
-            while True:
-                chunk = sock.recv(1024)
-                if not chunk:
-                    break
-                response += chunk
-                if b'\n' in response:
-                    break
+            conn = (sock, sock.makefile('rb', buffering=65536))
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _drop_connection(self):
+        """Close this thread's connection so the next command reconnects"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        for f in (conn[1], conn[0]):
+            try:
+                f.close()
+            except:
+                pass
+    
+    def _send_command(self, payload):
+        """Send a newline-terminated command and get response"""
+        try:
+            sock, rfile = self._connection()
+            sock.sendall(payload)
             
-            sock.close()
-            return response.decode().strip()
+            response = rfile.readline()
+            if not response:
+                raise ConnectionError("Connection closed by server")
+            return response.rstrip(b'\n').decode()
         except Exception as e:
+            self._drop_connection()
             return f"ERROR: {str(e)}"
     
+    def pipeline(self, commands):
+        """Send newline-terminated byte commands back-to-back, then read one response each
+        
+        Returns (responses, latencies_ns): one response string per command and an
+        int64 array of the time from the batch send until each response line
+        had been read (see finish_batch).
+        """
+        responses = []
+        stamps = []
+        start = time.perf_counter_ns()
+        try:
+            sock, rfile = self._connection()
+            # Time from the send, so a lazy connect is not charged to the batch's ops
+            start = time.perf_counter_ns()
+            sock.sendall(b"".join(commands))
+            
+            for _ in commands:
+                response = rfile.readline()
+                if not response:
+                    raise ConnectionError("Connection closed by server")
+                stamps.append(time.perf_counter_ns())
+                responses.append(response.rstrip(b'\n').decode())
+        except Exception as e:
+            self._drop_connection()
+            fail_batch(commands, responses, stamps, e)
+        return finish_batch(start, responses, stamps)
+    
+    def close_all(self):
+        """Close every thread's connection; threads reconnect on their next command"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for sock, rfile in connections:
+            for f in (rfile, sock):
+                try:
+                    f.close()
+                except:
+                    pass
+    
     def set(self, key, value):
-        return self._send_command(f"SET {key} {value}")
+        return self._send_command(f"SET {key} {value}\n".encode())
     
     def get(self, key):
-        return self._send_command(f"GET {key}")
+        return self._send_command(f"GET {key}\n".encode())
     
     def delete(self, key):
-        return self._send_command(f"DEL {key}")
+        return self._send_command(f"DEL {key}\n".encode())
 
 
-class PerformanceMetrics:
+# One client for every threaded phase: it holds no connections until a thread
+# sends its first command, and close_all() empties it again after each phase
+CLIENT = KVStoreClient()
+
+
+class AsyncKVStoreClient:
+    """asyncio counterpart of KVStoreClient with a single persistent connection
+    
+    Lets one event loop multiplex every worker instead of dedicating an OS
+    thread to each.
+    """
+    def __init__(self, host='localhost', port=8080):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+    
+    async def pipeline(self, commands):
+        """Send commands back-to-back, then read one response each
+        
+        Returns (responses, latencies_ns), like KVStoreClient.pipeline.
+        """
+        responses = []
+        stamps = []
+        start = time.perf_counter_ns()
+        try:
+            if self.writer is None:
+                await self.connect()
+            # Time from the send, so a (re)connect is not charged to the batch's ops
+            start = time.perf_counter_ns()
+            self.writer.write(b"".join(commands))
+            # Same 5 s bound as KVStoreClient's socket timeout, as one deadline over
+            # the drain and every readline; asyncio.timeout (3.11+) avoids the
+            # extra task wait_for creates
+            if hasattr(asyncio, 'timeout'):
+                async with asyncio.timeout(5.0):
+                    await self._read_responses(len(commands), responses, stamps)
+            else:
+                await asyncio.wait_for(self._read_responses(len(commands), responses, stamps), 5.0)
+        except asyncio.TimeoutError:
+            await self.close()
+            fail_batch(commands, responses, stamps, "Timeout")
+        except Exception as e:
+            await self.close()
+            fail_batch(commands, responses, stamps, e)
+        return finish_batch(start, responses, stamps)
+    
+    async def _read_responses(self, count, responses, stamps):
+        """Flush the batch, then read count responses, stamping each as it arrives"""
+        await self.writer.drain()
+        for _ in range(count):
+            response = await self.reader.readline()
+            if not response:
+                raise ConnectionError("Connection closed by server")
+            stamps.append(time.perf_counter_ns())
+            responses.append(response.rstrip(b'\n').decode())
+    
+    async def connect(self):
+        """Open the stream over a socket tuned before connecting"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        tune_socket(sock)
+        try:
+            await asyncio.wait_for(
+                asyncio.get_running_loop().sock_connect(sock, (self.host, self.port)), 5.0)
+        except BaseException:
+            sock.close()
+            raise
+        self.reader, self.writer = await asyncio.open_connection(sock=sock)
+    
+    async def close(self):
+        """Close the connection if open"""
+        if self.writer is None:
+            return
+        writer, self.reader, self.writer = self.writer, None, None
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+
+# Latency histogram layout: log-linear buckets, BUCKETS_PER_OCTAVE per power of
+# two of nanoseconds, up to 2**48 ns. Reporting a bucket's geometric midpoint
+# keeps every quantile within ~0.55% of the true sample.
+BUCKETS_PER_OCTAVE = 64
+LATENCY_BUCKETS = 48 * BUCKETS_PER_OCTAVE
+
+
+class LocalMetrics:
+    """One worker's samples as a fixed-size latency histogram, updated without locking
+    
+    Memory stays constant however many ops run, and histograms merge by
+    adding counts. min, max and mean are tracked exactly.
+    """
     def __init__(self):
-        self.latencies = []
+        self.counts = np.zeros(LATENCY_BUCKETS, dtype=np.int64)
+        self.count = 0
         self.successes = 0
-        self.errors = 0
+        self.total_ns = 0
+        self.min_ns = np.iinfo(np.int64).max
+        self.max_ns = 0
+    
+    def record_batch(self, latencies, oks):
+        """Add a batch of int64 latencies (ns) and their success flags"""
+        buckets = (np.log2(np.maximum(latencies, 1)) * BUCKETS_PER_OCTAVE).astype(np.intp)
+        np.add.at(self.counts, np.minimum(buckets, LATENCY_BUCKETS - 1), 1)
+        self.count += len(latencies)
+        self.successes += sum(oks)
+        self.total_ns += int(latencies.sum())
+        self.min_ns = min(self.min_ns, int(latencies.min()))
+        self.max_ns = max(self.max_ns, int(latencies.max()))
+    
+    def merge(self, other):
+        self.counts += other.counts
+        self.count += other.count
+        self.successes += other.successes
+        self.total_ns += other.total_ns
+        self.min_ns = min(self.min_ns, other.min_ns)
+        self.max_ns = max(self.max_ns, other.max_ns)
+    
+    def quantiles_ns(self, percentiles):
+        """Nearest-rank percentiles read off the histogram, clamped to the exact min/max"""
+        ranks = np.maximum(np.ceil(np.asarray(percentiles) / 100 * self.count), 1)
+        buckets = np.searchsorted(np.cumsum(self.counts), ranks)
+        return np.clip(2 ** ((buckets + 0.5) / BUCKETS_PER_OCTAVE), self.min_ns, self.max_ns)
+
+
+class PerformanceMetrics:
+    """Merges each worker's LocalMetrics into one histogram and reports from it
+    
+    Workers fill their own local() and merge() it when they finish, so the
+    lock is taken once per worker rather than once per operation.
+    """
+    def __init__(self):
+        self._total = LocalMetrics()
         self.lock = threading.Lock()
     
-    def record(self, latency, success=True):
+    def local(self):
+        return LocalMetrics()
+    
+    def merge(self, local):
         with self.lock:
-            self.latencies.append(latency)
-            if success:
-                self.successes += 1
-            else:
-                self.errors += 1
+            self._total.merge(local)
+    
+    def combined(self):
+        """All merged samples as a single LocalMetrics, e.g. to return from a worker process"""
+        combined = LocalMetrics()
+        with self.lock:
+            combined.merge(self._total)
+        return combined
     
     def get_stats(self):
+        # Read the merged histogram in place rather than copying it via combined():
+        # one cumulative pass below serves all three percentiles
         with self.lock:
-            if not self.latencies:
+            samples = self._total
+            count = samples.count
+            if not count:
                 return None
+            
+            # Convert to milliseconds once here rather than per recorded op
+            median, p95, p99 = samples.quantiles_ns([50, 95, 99]) * 1e-6
             return {
-                'count': len(self.latencies),
-                'successes': self.successes,
-                'errors': self.errors,
-                'min': min(self.latencies),
-                'max': max(self.latencies),
-                'mean': statistics.mean(self.latencies),
-                'median': statistics.median(self.latencies),
-                'p95': self._percentile(self.latencies, 95),
-                'p99': self._percentile(self.latencies, 99),
+                'count': count,
+                'successes': samples.successes,
+                'errors': count - samples.successes,
+                'min': samples.min_ns * 1e-6,
+                'max': samples.max_ns * 1e-6,
+                'mean': samples.total_ns / count * 1e-6,
+                'median': median,
+                'p95': p95,
+                'p99': p99,
             }
+
+
+# Operations each worker writes back-to-back before reading the responses
+PIPELINE_BATCH = 128
+
+
+def set_ok(result):
+    return result == "OK"
+
+
+def get_ok(result):
+    return result != "ERROR"
+
+
+def delete_ok(result):
+    return result in ("DELETED", "NOT_FOUND")
+
+
+# Op codes used in worker schedules; also indexes CHECKS and key_dispatch() tuples
+GET, SET, DEL = 0, 1, 2
+CHECKS = (get_ok, set_ok, delete_ok)
+
+
+# Op-code patterns for each workload's read/write/delete ratio
+READ_HEAVY_OPS = bytes([SET] + [GET] * 9)
+WRITE_HEAVY_OPS = bytes([GET] + [SET] * 9)
+BALANCED_OPS = bytes([SET, GET])
+MIXED_OPS = bytes([GET] * 6 + [SET] * 3 + [DEL])
+
+# Schedules and command templates depend only on their arguments, so they are
+# cached at module level: within a process, the warmup and all five run_test
+# calls reuse them instead of rebuilding them for every worker.
+
+@functools.lru_cache(maxsize=None)
+def op_plan(pattern, num_ops):
+    """Repeat an op-code pattern out to num_ops codes (read-only; shared between workers)"""
+    return (pattern * (num_ops // len(pattern) + 1))[:num_ops]
+
+
+@functools.lru_cache(maxsize=None)
+def key_dispatch(key, thread_id):
+    """Command builders for one key, indexed by op code and called with the op index
     
-    def _percentile(self, data, percentile):
-        sorted_data = sorted(data)
-        index = int(len(sorted_data) * percentile / 100)
-        return sorted_data[min(index, len(sorted_data) - 1)]
+    GET and DEL return prebuilt bytes. SET appends only b"%d\n" % i to a
+    prebuilt prefix, so no command is formatted or encoded per op.
+    """
+    key = key.encode()
+    get_cmd = b"GET " + key + b"\n"
+    del_cmd = b"DEL " + key + b"\n"
+    set_prefix = b"SET " + key + b" value_%d_" % thread_id
+    return (lambda i: get_cmd, lambda i: set_prefix + b"%d\n" % i, lambda i: del_cmd)
 
 
-def worker_read_heavy(thread_id, num_ops, key_range, metrics, client):
+# Workers are generators: each yields batches of commands and is sent back the
+# pipelined (responses, latencies_ns) results, so the same worker runs unchanged
+# on a thread (run_workload) or as an asyncio task (run_workload_async).
+
+def run_pipelined(plan, keys, metrics):
+    """Yield a worker's schedule in batches of PIPELINE_BATCH and record the results
+    
+    plan holds one op code per op and keys the key_dispatch() tuple it targets.
+    Each batch's latencies and outcomes go into the worker's LocalMetrics in
+    one call; an op's latency runs from the send of its batch to the read of
+    its own response.
+    """
+    for base in range(0, len(plan), PIPELINE_BATCH):
+        end = min(base + PIPELINE_BATCH, len(plan))
+        codes = plan[base:end]
+        responses, latencies = yield [keys[i][code](i) for i, code in zip(range(base, end), codes)]
+        metrics.record_batch(latencies, [CHECKS[code](result) for code, result in zip(codes, responses)])
+
+
+def run_workload(client, workload):
+    """Drive a worker generator to completion over a blocking client"""
+    results = None
+    while True:
+        try:
+            commands = workload.send(results)
+        except StopIteration:
+            return
+        results = client.pipeline(commands)
+
+
+async def run_workload_async(client, workload):
+    """Drive a worker generator to completion over an asyncio client"""
+    results = None
+    while True:
+        try:
+            commands = workload.send(results)
+        except StopIteration:
+            return
+        results = await client.pipeline(commands)
+
+
+def worker_read_heavy(thread_id, num_ops, key_range, metrics):
     """Read-heavy workload: 90% reads, 10% writes"""
-    for i in range(num_ops):
-        key = f"key{thread_id % key_range}"
-        start = time.perf_counter()
-        
-        if i % 10 == 0:  # 10% writes
-            result = client.set(key, f"value_{thread_id}_{i}")
-            success = result == "OK"
-        else:  # 90% reads
-            result = client.get(key)
-            success = result != "ERROR"
-        
-        latency = (time.perf_counter() - start) * 1000  # Convert to ms
-        metrics.record(latency, success)
+    plan = op_plan(READ_HEAVY_OPS, num_ops)
+    keys = [key_dispatch(f"key{thread_id % key_range}", thread_id)] * num_ops
+    yield from run_pipelined(plan, keys, metrics)
 
 
-def worker_write_heavy(thread_id, num_ops, key_range, metrics, client):
+def worker_write_heavy(thread_id, num_ops, key_range, metrics):
     """Write-heavy workload: 10% reads, 90% writes"""
-    for i in range(num_ops):
-        key = f"key{thread_id % key_range}"
-        start = time.perf_counter()
-        
-        if i % 10 == 0:  # 10% reads
-            result = client.get(key)
-            success = result != "ERROR"
-        else:  # 90% writes
-            result = client.set(key, f"value_{thread_id}_{i}")
-            success = result == "OK"
-        
-        latency = (time.perf_counter() - start) * 1000
-        metrics.record(latency, success)
+    plan = op_plan(WRITE_HEAVY_OPS, num_ops)
+    keys = [key_dispatch(f"key{thread_id % key_range}", thread_id)] * num_ops
+    yield from run_pipelined(plan, keys, metrics)
 
 
-def worker_balanced(thread_id, num_ops, key_range, metrics, client):
+def worker_balanced(thread_id, num_ops, key_range, metrics):
     """Balanced workload: 50% reads, 50% writes"""
-    for i in range(num_ops):
-        key = f"key{thread_id % key_range}"
-        start = time.perf_counter()
-        
-        if i % 2 == 0:
-            result = client.set(key, f"value_{thread_id}_{i}")
-            success = result == "OK"
-        else:
-            result = client.get(key)
-            success = result != "ERROR"
-        
-        latency = (time.perf_counter() - start) * 1000
-        metrics.record(latency, success)
+    plan = op_plan(BALANCED_OPS, num_ops)
+    keys = [key_dispatch(f"key{thread_id % key_range}", thread_id)] * num_ops
+    yield from run_pipelined(plan, keys, metrics)
 
 
-def worker_mixed(thread_id, num_ops, key_range, metrics, client):
+def worker_mixed(thread_id, num_ops, key_range, metrics):
     """Mixed workload: 60% reads, 30% writes, 10% deletes"""
-    for i in range(num_ops):
-        key = f"key{thread_id % key_range}"
-        start = time.perf_counter()
-        
-        op_type = i % 10
-        if op_type < 6:  # 60% reads
-            result = client.get(key)
-            success = result != "ERROR"
-        elif op_type < 9:  # 30% writes
-            result = client.set(key, f"value_{thread_id}_{i}")
-            success = result == "OK"
-        else:  # 10% deletes
-            result = client.delete(key)
-            success = result in ("DELETED", "NOT_FOUND")
-        
-        latency = (time.perf_counter() - start) * 1000
-        metrics.record(latency, success)
+    plan = op_plan(MIXED_OPS, num_ops)
+    keys = [key_dispatch(f"key{thread_id % key_range}", thread_id)] * num_ops
+    yield from run_pipelined(plan, keys, metrics)
 
 
-def worker_hot_keys(thread_id, num_ops, hot_key_ratio, metrics, client):
+def worker_hot_keys(thread_id, num_ops, hot_key_ratio, metrics):
     """Workload with hot keys: some keys are accessed much more frequently"""
-    hot_keys = [f"hot_key_{i}" for i in range(5)]
-    cold_keys = [f"cold_key_{i}" for i in range(100)]
-    
-    for i in range(num_ops):
-        # 80% of operations target hot keys
-        if i % 100 < 80:
-            key = hot_keys[i % len(hot_keys)]
-        else:
-            key = cold_keys[i % len(cold_keys)]
-        
-        start = time.perf_counter()
-        if i % 2 == 0:
-            result = client.set(key, f"value_{thread_id}_{i}")
-            success = result == "OK"
-        else:
-            result = client.get(key)
-            success = result != "ERROR"
+    hot_keys = [key_dispatch(f"hot_key_{i}", thread_id) for i in range(5)]
+    cold_keys = [key_dispatch(f"cold_key_{i}", thread_id) for i in range(100)]
+    
+    plan = op_plan(BALANCED_OPS, num_ops)
+    # 80% of operations target hot keys
+    keys = [hot_keys[i % len(hot_keys)] if i % 100 < 80 else cold_keys[i % len(cold_keys)]
+            for i in range(num_ops)]
+    yield from run_pipelined(plan, keys, metrics)
+
+
+def run_worker(worker_func, thread_id, num_ops, key_range, metrics, client, **kwargs):
+    """Run worker_func against its own LocalMetrics and merge them into metrics once at the end"""
+    local = metrics.local()
+    try:
+        run_workload(client, worker_func(thread_id, num_ops, key_range, local, **kwargs))
+    finally:
+        metrics.merge(local)
+
+
+def run_workers_threaded(worker_func, thread_ids, num_ops, key_range, metrics, **kwargs):
+    """Run each worker on its own thread, sharing the module-level CLIENT"""
+    client = CLIENT
+    with ThreadPoolExecutor(max_workers=len(thread_ids)) as executor:
+        futures = []
+        for t in thread_ids:
+            future = executor.submit(run_worker, worker_func, t, num_ops, key_range, metrics, client, **kwargs)
+            futures.append(future)
         
-        latency = (time.perf_counter() - start) * 1000
-        metrics.record(latency, success)
+        # Wait for all threads
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Worker error: {e}")
+    client.close_all()
+
+
+def run_workers_queued(worker_func, thread_ids, num_ops, key_range, metrics, **kwargs):
+    """Run the workers as virtual clients drained from a queue by a fixed pool of 2 x CPU threads
+    
+    Each pool thread runs one virtual client at a time over its single
+    persistent CLIENT connection, so OS threads stay bounded however many
+    workers the test asks for.
+    """
+    jobs = queue.Queue()
+    for t in thread_ids:
+        jobs.put(t)
+    
+    def drain():
+        while True:
+            try:
+                t = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                run_worker(worker_func, t, num_ops, key_range, metrics, CLIENT, **kwargs)
+            except Exception as e:
+                print(f"Worker error: {e}")
+    
+    pool = [threading.Thread(target=drain) for _ in range(min(len(thread_ids), 2 * (os.cpu_count() or 1)))]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    CLIENT.close_all()
+
+
+async def run_workers_async(worker_func, thread_ids, num_ops, key_range, metrics, **kwargs):
+    """Run each worker as a task on one event loop, each with its own connection
+    
+    Every client connects before any worker starts, so connection setup
+    doesn't queue up behind (or inflate the latencies of) running workers.
+    """
+    clients = [AsyncKVStoreClient() for _ in thread_ids]
+    connected = await asyncio.gather(*[client.connect() for client in clients], return_exceptions=True)
+    for thread_id, result in zip(thread_ids, connected):
+        if isinstance(result, Exception):
+            # Left unconnected; its first batch retries and reports the failure
+            print(f"Worker {thread_id} connection error: {result}")
+    
+    async def run_one(thread_id, client):
+        local = metrics.local()
+        try:
+            await run_workload_async(client, worker_func(thread_id, num_ops, key_range, local, **kwargs))
+        except Exception as e:
+            print(f"Worker error: {e}")
+        finally:
+            metrics.merge(local)
+            await client.close()
+    
+    await asyncio.gather(*[run_one(t, client) for t, client in zip(thread_ids, clients)])
+
+
+def run_workers(driver, worker_func, thread_ids, num_ops, key_range, metrics, **kwargs):
+    """Run one copy of worker_func per thread id to completion on the chosen driver"""
+    if driver == 'asyncio':
+        asyncio.run(run_workers_async(worker_func, thread_ids, num_ops, key_range, metrics, **kwargs))
+    elif driver == 'queue':
+        run_workers_queued(worker_func, thread_ids, num_ops, key_range, metrics, **kwargs)
+    else:
+        run_workers_threaded(worker_func, thread_ids, num_ops, key_range, metrics, **kwargs)
+
+
+def shard_ready(barrier):
+    """Pool initializer: signal that this shard process has started and imported the module"""
+    barrier.wait()
+
+
+def run_worker_shard(driver, worker_func, thread_ids, num_ops, key_range, kwargs):
+    """Run one process's share of the workers and return their samples as a LocalMetrics"""
+    metrics = PerformanceMetrics()
+    run_workers(driver, worker_func, thread_ids, num_ops, key_range, metrics, **kwargs)
+    return metrics.combined()
 
 
-def run_test(test_name, worker_func, num_threads, ops_per_thread, key_range=100, **kwargs):
-    """Run a concurrent performance test"""
+def run_test(test_name, worker_func, num_threads, ops_per_thread, key_range=100, driver='asyncio',
+             processes=None, **kwargs):
+    """Run a concurrent performance test
+    
+    Workers are sharded across processes (default: one per CPU, at most one
+    per thread) so the client's Python overhead is not bound to a single GIL.
+    """
+    processes = min(num_threads, processes or os.cpu_count() or 1)
     print(f"\n{'='*60}")
     print(f"Test: {test_name}")
-    print(f"Threads: {num_threads}, Ops per thread: {ops_per_thread}")
+    print(f"Threads: {num_threads}, Ops per thread: {ops_per_thread}, Driver: {driver}, Processes: {processes}")
     print(f"{'='*60}")
     
     metrics = PerformanceMetrics()
-    client = KVStoreClient()
     
     # Warmup phase
     print("Warming up...")
-    warmup_metrics = PerformanceMetrics()
     warmup_threads = min(5, num_threads)
-    with ThreadPoolExecutor(max_workers=warmup_threads) as executor:
-        futures = []
-        for t in range(warmup_threads):
-            future = executor.submit(worker_func, t, ops_per_thread // 10, key_range, warmup_metrics, client)
-            futures.append(future)
-        for future in as_completed(futures):
-            future.result()
+    warmup_metrics = PerformanceMetrics()
+    run_workers(driver, worker_func, range(warmup_threads), ops_per_thread // 10, key_range, warmup_metrics)
     
     # Actual test
     print("Running test...")
-    start_time = time.perf_counter()
-    
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        futures = []
-        for t in range(num_threads):
-            future = executor.submit(worker_func, t, ops_per_thread, key_range, metrics, client, **kwargs)
-            futures.append(future)
-        
-        # Wait for all threads
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                print(f"Worker error: {e}")
-    
-    end_time = time.perf_counter()
+    if processes > 1:
+        # Deal thread ids out round-robin so every worker keeps its id, and so its key
+        shards = [(driver, worker_func, range(p, num_threads, processes), ops_per_thread, key_range, kwargs)
+                  for p in range(processes)]
+        barrier = multiprocessing.Barrier(processes + 1)
+        with multiprocessing.Pool(processes, initializer=shard_ready, initargs=(barrier,)) as pool:
+            # Pool() returns before its processes are up; under spawn/forkserver
+            # they still have to start an interpreter and import numpy. Wait for
+            # all of them so that start-up stays outside the timed region.
+            barrier.wait()
+            start_time = time.perf_counter()
+            for shard in pool.starmap(run_worker_shard, shards):
+                metrics.merge(shard)
+            end_time = time.perf_counter()
+    else:
+        start_time = time.perf_counter()
+        run_workers(driver, worker_func, range(num_threads), ops_per_thread, key_range, metrics, **kwargs)
+        end_time = time.perf_counter()
     elapsed = end_time - start_time
     
     # Print results
@@ -252,7 +638,7 @@ def verify_consistency(num_threads, ops_per_thread):
     print("Consistency Test")
     print(f"{'='*60}")
     
-    client = KVStoreClient()
+    client = CLIENT
     errors = []
     
     # Initialize test keys
@@ -266,17 +652,19 @@ def verify_consistency(num_threads, ops_per_thread):
             key_id = i % num_keys
             key = f"consistency_key_{key_id}"
             
-            # Write operation
+            # Write, read back and read again in one pipelined round trip
             value = f"value_t{thread_id}_op{i}"
-            client.set(key, value)
+            (_, result, result2), _ = client.pipeline([
+                f"SET {key} {value}\n".encode(),
+                f"GET {key}\n".encode(),
+                f"GET {key}\n".encode(),
+            ])
             
             # Read back - should get our value or a later value
-            result = client.get(key)
             if result == "ERROR" or result == "NOT_FOUND":
                 local_errors.append(f"Thread {thread_id}, op {i}: Read failed")
             
             # Verify we can still read it
-            result2 = client.get(key)
             if result2 != result:
                 local_errors.append(f"Thread {thread_id}, op {i}: Inconsistent reads")
         
@@ -286,6 +674,7 @@ def verify_consistency(num_threads, ops_per_thread):
         futures = [executor.submit(consistency_worker, t) for t in range(num_threads)]
         for future in as_completed(futures):
             errors.extend(future.result())
+    client.close_all()
     
     if errors:
         print(f"Found {len(errors)} consistency errors:")
@@ -304,45 +693,52 @@ def main():
     parser.add_argument('--skip-consistency', action='store_true', help='Skip consistency test')
     parser.add_argument('--workload', choices=['all', 'read', 'write', 'balanced', 'mixed', 'hot'], 
                        default='all', help='Workload type to test')
+    parser.add_argument('--processes', type=int, default=None,
+                       help='Worker processes to shard threads across (default: min(threads, CPU count))')
+    parser.add_argument('--driver', choices=['asyncio', 'queue', 'threads'], default='asyncio',
+                       help='Run workers as asyncio tasks on one event loop, as virtual clients on a '
+                            '2 x CPU thread pool, or one OS thread each (default: asyncio)')
     
     args = parser.parse_args()
     
     # Check if server is running
     try:
-        client = KVStoreClient()
+        client = CLIENT
         result = client.set("test", "test")
         if "ERROR" in result and "Connection" in result:
             print("Error: Cannot connect to server. Make sure it's running on localhost:8080")
             sys.exit(1)
+        client.close_all()
     except Exception as e:
         print(f"Error: Cannot connect to server: {e}")
         sys.exit(1)
     
     print("KVStore Concurrent Performance Test Suite")
-    print(f"Testing with {args.threads} threads, {args.ops} ops per thread")
+    print(f"Testing with {args.threads} threads, {args.ops} ops per thread ({args.driver} driver)")
     
     # Run tests based on workload type
+    options = dict(driver=args.driver, processes=args.processes)
     if args.workload == 'all':
         run_test("Read-Heavy Workload (90% read, 10% write)", 
-                worker_read_heavy, args.threads, args.ops)
+                worker_read_heavy, args.threads, args.ops, **options)
         run_test("Write-Heavy Workload (10% read, 90% write)", 
-                worker_write_heavy, args.threads, args.ops)
+                worker_write_heavy, args.threads, args.ops, **options)
         run_test("Balanced Workload (50% read, 50% write)", 
-                worker_balanced, args.threads, args.ops)
+                worker_balanced, args.threads, args.ops, **options)
         run_test("Mixed Workload (60% read, 30% write, 10% delete)", 
-                worker_mixed, args.threads, args.ops)
+                worker_mixed, args.threads, args.ops, **options)
         run_test("Hot Keys Workload (80% hot, 20% cold)", 
-                worker_hot_keys, args.threads, args.ops)
+                worker_hot_keys, args.threads, args.ops, **options)
     elif args.workload == 'read':
-        run_test("Read-Heavy Workload", worker_read_heavy, args.threads, args.ops)
+        run_test("Read-Heavy Workload", worker_read_heavy, args.threads, args.ops, **options)
     elif args.workload == 'write':
-        run_test("Write-Heavy Workload", worker_write_heavy, args.threads, args.ops)
+        run_test("Write-Heavy Workload", worker_write_heavy, args.threads, args.ops, **options)
     elif args.workload == 'balanced':
-        run_test("Balanced Workload", worker_balanced, args.threads, args.ops)
+        run_test("Balanced Workload", worker_balanced, args.threads, args.ops, **options)
     elif args.workload == 'mixed':
-        run_test("Mixed Workload", worker_mixed, args.threads, args.ops)
+        run_test("Mixed Workload", worker_mixed, args.threads, args.ops, **options)
     elif args.workload == 'hot':
-        run_test("Hot Keys Workload", worker_hot_keys, args.threads, args.ops)
+        run_test("Hot Keys Workload", worker_hot_keys, args.threads, args.ops, **options)
     
     # Consistency test
     if not args.skip_consistency: